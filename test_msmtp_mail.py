@@ -9,7 +9,8 @@ import unittest
 from unittest.mock import patch, MagicMock
 import os
 import json
-from msmtp_mail import EmailMessageBuilder, MsmtpClient, MsmtpSendError, EmailBuildError, MSMTP_FROM_EMAIL
+from msmtp_mail import (EmailMessageBuilder, MsmtpClient, MsmtpSendError,
+                        EmailBuildError, SmtpConnectionPool, MSMTP_FROM_EMAIL)
 
 
 class TestMsmtpMail(unittest.TestCase):
@@ -63,8 +64,123 @@ class TestMsmtpMail(unittest.TestCase):
         b.add_attachment(tmp_file)
         msg = b.build()
         self.assertTrue(len(msg.get_payload()) > 1)  # attachment + body
+        attachment = msg.get_payload()[-1]
+        self.assertEqual(attachment.get_payload(decode=True), b"test content")
         os.remove(tmp_file)
 
+        # Compound extensions resolve through the full suffix chain
+        tar_file = os.path.join(self.test_dir, "report.tar.gz")
+        with open(tar_file, "wb") as f:
+            f.write(b"fake tarball")
+        b.add_attachment(tar_file)
+        attachment = b.build().get_payload()[-1]
+        self.assertEqual(attachment.get_content_type(), "application/x-tar")
+        os.remove(tar_file)
+
+    def test_add_attachment_quoted_filename(self):
+        """Test attachment filenames with quotes survive a roundtrip."""
+        import io
+        b = EmailMessageBuilder()
+        b.add_to("dest@example.com")
+        b.set_subject("Subj")
+        b.set_body("Body")
+        b.add_attachment_stream(io.BytesIO(b"quoted"), 'a"b.txt')
+        msg = b.build()
+        attachment = msg.get_payload()[-1]
+        self.assertEqual(attachment.get_filename(), 'a"b.txt')
+        self.assertEqual(attachment.get_payload(decode=True), b"quoted")
+
+    def test_add_attachment_stream(self):
+        """Test attaching from a binary file-like object."""
+        import io
+        b = EmailMessageBuilder()
+        b.add_to("dest@example.com")
+        b.set_subject("Subj")
+        b.set_body("Body")
+        b.add_attachment_stream(io.BytesIO(b"streamed bytes"), "data.bin")
+        msg = b.build()
+        attachment = msg.get_payload()[-1]
+        self.assertEqual(attachment.get_payload(decode=True), b"streamed bytes")
+        self.assertEqual(attachment.get_filename(), "data.bin")
+
+    def test_lazy_attachment_streamed_at_send_time(self):
+        """Test lazy attachments are encoded into the stream, not the message."""
+        import email
+        import io
+        tmp_file = os.path.join(self.test_dir, "temp_lazy.txt")
+        with open(tmp_file, "w") as f:
+            f.write("lazy content")
+        try:
+            b = EmailMessageBuilder()
+            b.add_to("dest@example.com")
+            b.set_subject("Subj")
+            b.set_body("Body")
+            b.add_attachment(tmp_file, lazy=True)
+
+            buf = io.BytesIO()
+            b.stream(buf)
+            parsed = email.message_from_bytes(buf.getvalue())
+            parts = parsed.get_payload()
+            self.assertTrue(parsed.is_multipart())
+            self.assertEqual(parts[-1].get_payload(decode=True), b"lazy content")
+            self.assertEqual(parts[-1].get_filename(), "temp_lazy.txt")
+            # The builder's message itself holds no attachment payload
+            self.assertNotIn(b"lazy content",
+                             b.build().get_payload()[0].get_payload(decode=True))
+        finally:
+            os.remove(tmp_file)
+
+    def test_lazy_attachment_non_ascii_filename(self):
+        """Test lazy attachment headers survive a non-ASCII filename."""
+        import email
+        import io
+        tmp_file = os.path.join(self.test_dir, "temp_lazy2.txt")
+        with open(tmp_file, "w") as f:
+            f.write("lazy content")
+        try:
+            b = EmailMessageBuilder()
+            b.add_to("dest@example.com")
+            b.set_subject("Subj")
+            b.set_body("Body")
+            b.add_attachment(tmp_file, lazy=True, filename="décembre.txt")
+
+            buf = io.BytesIO()
+            b.stream(buf)
+            parsed = email.message_from_bytes(buf.getvalue())
+            parts = parsed.get_payload()
+            self.assertEqual(parts[-1].get_filename(), "décembre.txt")
+            self.assertEqual(parts[-1].get_payload(decode=True), b"lazy content")
+        finally:
+            os.remove(tmp_file)
+
+    def test_compressed_body_and_attachment(self):
+        """Test opt-in gzip for large bodies and compressible attachments."""
+        import gzip
+        text = "report line\n" * 2000  # > 8 KB, highly compressible
+        b = EmailMessageBuilder()
+        b.add_to("dest@example.com")
+        b.set_subject("Subj")
+        b.set_body(text, compress=True)
+        msg = b.build()
+        self.assertEqual(msg.get_content_type(), "application/gzip")
+        self.assertEqual(gzip.decompress(msg.get_payload(decode=True)).decode(), text)
+
+        tmp_file = os.path.join(self.test_dir, "temp_big.txt")
+        with open(tmp_file, "w") as f:
+            f.write("csv,data,row\n" * 10000)  # > 64 KB
+        try:
+            b2 = EmailMessageBuilder()
+            b2.add_to("dest@example.com")
+            b2.set_subject("Subj")
+            b2.set_body("Body")
+            b2.add_attachment(tmp_file, auto_compress=True)
+            attachment = b2.build().get_payload()[-1]
+            self.assertEqual(attachment.get_filename(), "temp_big.txt.gz")
+            self.assertEqual(gzip.decompress(attachment.get_payload(decode=True)),
+                             b"csv,data,row\n" * 10000)
+        finally:
+            os.remove(tmp_file)
+
     def test_load_recipients_from_json_object(self):
         b = EmailMessageBuilder()
         b.load_recipients_from_file(self.json_object_path)
@@ -77,6 +193,36 @@ class TestMsmtpMail(unittest.TestCase):
         self.assertIn("c@example.com", b._to)
         self.assertIn("d@example.com", b._to)
 
+    def test_build_is_cached_until_modified(self):
+        """Test build() reuses the cached message and rebuilds on change."""
+        b = EmailMessageBuilder()
+        b.add_to("dest@example.com")
+        b.set_subject("Subj")
+        b.set_body("Body")
+        msg1 = b.build()
+        self.assertIs(b.build(), msg1)
+        self.assertEqual(len(msg1.get_all("From")), 1)
+
+        raw1 = b.as_bytes()
+        self.assertIs(b.as_bytes(), raw1)
+
+        b.add_cc("cc@example.com")
+        msg2 = b.build()
+        self.assertEqual(msg2["Cc"], "cc@example.com")
+        self.assertEqual(len(msg2.get_all("From")), 1)
+        self.assertNotEqual(b.as_bytes(), raw1)
+
+    def test_invalid_address_rejected(self):
+        """Test that malformed addresses are rejected before any send."""
+        b = EmailMessageBuilder()
+        for bad in ("not-an-email", "missing@tld", "two words@example.com"):
+            with self.assertRaises(EmailBuildError):
+                b.add_to(bad)
+        with self.assertRaises(EmailBuildError):
+            b.add_cc("@example.com")
+        with self.assertRaises(EmailBuildError):
+            b.add_bcc("nope")
+
     def test_no_recipients_error(self):
         b = EmailMessageBuilder()
         b.set_subject("Test")
@@ -97,48 +243,309 @@ class TestMsmtpMail(unittest.TestCase):
         b.set_subject("Test")
         with self.assertRaises(EmailBuildError):
             b.build()
+        # An explicitly empty body counts as no body
+        b.set_body("")
+        with self.assertRaises(EmailBuildError):
+            b.build()
 
     # -----------------------
     # MsmtpClient tests
     # -----------------------
-    @patch("msmtp_mail.subprocess.run")
-    def test_send_success(self, mock_run):
-        """Test that MsmtpClient.send() calls subprocess.run with correct args."""
+    @patch("msmtp_mail.subprocess.Popen")
+    def test_send_success(self, mock_popen):
+        """Test that MsmtpClient.send() streams the message into msmtp."""
         mock_proc = MagicMock()
         mock_proc.returncode = 0
-        mock_proc.stdout = b"OK"
-        mock_proc.stderr = b""
-        mock_run.return_value = mock_proc
+        mock_proc.communicate.return_value = (b"OK", b"")
+        mock_popen.return_value = mock_proc
 
         b = EmailMessageBuilder()
         b.add_to("dest@example.com")
         b.set_subject("OK")
         b.set_body("Hi")
 
-        client = MsmtpClient()
+        client = MsmtpClient(transport="msmtp")
         client.send(b)
 
-        called_cmd = mock_run.call_args[0][0]
+        called_cmd = mock_popen.call_args[0][0]
         self.assertIn("-a", called_cmd)
         self.assertIn("gmail", called_cmd)
+        self.assertTrue(mock_proc.stdin.write.called)
+        mock_proc.stdin.close.assert_called_once()
 
-    @patch("msmtp_mail.subprocess.run")
-    def test_send_failure(self, mock_run):
+    @patch("msmtp_mail.subprocess.Popen")
+    def test_send_failure(self, mock_popen):
         """Test MsmtpClient.send() raises MsmtpSendError on failure."""
         mock_proc = MagicMock()
         mock_proc.returncode = 1
-        mock_proc.stderr = b"AUTH error"
-        mock_run.return_value = mock_proc
+        mock_proc.communicate.return_value = (b"", b"AUTH error")
+        mock_popen.return_value = mock_proc
 
         b = EmailMessageBuilder()
         b.add_to("dest@example.com")
         b.set_subject("Fail")
         b.set_body("Body")
 
-        client = MsmtpClient()
+        client = MsmtpClient(transport="msmtp")
         with self.assertRaises(MsmtpSendError):
             client.send(b)
 
+    # -----------------------
+    # Persistent smtplib connection tests
+    # -----------------------
+    @patch("msmtp_mail._load_smtp_config")
+    @patch("msmtp_mail.smtplib.SMTP_SSL")
+    def test_send_smtplib_reuses_connection(self, mock_smtp_ssl, mock_conf):
+        """Test that two send() calls share one SMTP connection."""
+        mock_conf.return_value = {"host": "smtp.test", "port": 465,
+                                  "user": "u", "password": "p"}
+
+        def make_builder():
+            b = EmailMessageBuilder()
+            b.add_to("dest@example.com")
+            b.set_subject("OK")
+            b.set_body("Hi")
+            return b
+
+        client = MsmtpClient()  # smtplib is the default transport
+        client.send(make_builder())
+        client.send(make_builder())
+
+        self.assertEqual(mock_smtp_ssl.call_count, 1)
+        smtp = mock_smtp_ssl.return_value
+        smtp.login.assert_called_once_with("u", "p")
+        self.assertEqual(smtp.sendmail.call_count, 2)
+        client.close()
+        smtp.close.assert_called()
+
+    @patch("msmtp_mail._load_smtp_config")
+    @patch("msmtp_mail.smtplib.SMTP_SSL")
+    def test_send_smtplib_reconnects_on_disconnect(self, mock_smtp_ssl, mock_conf):
+        """Test that a dropped connection is re-opened and the send retried."""
+        import smtplib
+        mock_conf.return_value = {"host": "smtp.test", "port": 465,
+                                  "user": "u", "password": "p"}
+        smtp = mock_smtp_ssl.return_value
+        smtp.sendmail.side_effect = [
+            smtplib.SMTPServerDisconnected("gone"), None]
+
+        b = EmailMessageBuilder()
+        b.add_to("dest@example.com")
+        b.set_subject("OK")
+        b.set_body("Hi")
+
+        client = MsmtpClient(use_msmtp=False)
+        client.send(b)
+
+        self.assertEqual(mock_smtp_ssl.call_count, 2)
+        self.assertEqual(smtp.sendmail.call_count, 2)
+
+    @patch("msmtp_mail._load_smtp_config")
+    @patch("msmtp_mail.smtplib.SMTP_SSL")
+    def test_send_many_single_connection_partial_failure(self, mock_smtp_ssl, mock_conf):
+        """Test send_many reuses one connection and reports per-message results."""
+        import smtplib
+        mock_conf.return_value = {"host": "smtp.test", "port": 465,
+                                  "user": "u", "password": "p"}
+        smtp = mock_smtp_ssl.return_value
+        smtp.sendmail.side_effect = [
+            None,
+            smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"no")}),
+            None,
+        ]
+
+        def make_builder(to):
+            b = EmailMessageBuilder()
+            b.add_to(to)
+            b.set_subject("Batch")
+            b.set_body("Hi")
+            return b
+
+        client = MsmtpClient(use_msmtp=False)
+        results = client.send_many([make_builder("a@example.com"),
+                                    make_builder("bad@example.com"),
+                                    make_builder("c@example.com")])
+
+        self.assertEqual(mock_smtp_ssl.call_count, 1)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(results[0][0])
+        self.assertFalse(results[1][0])
+        self.assertTrue(results[2][0])
+
+    @patch("msmtp_mail.subprocess.Popen")
+    def test_send_many_with_msmtp_transport(self, mock_popen):
+        """Test the batch APIs fall back to per-message msmtp sends."""
+        mock_proc = MagicMock()
+        mock_proc.returncode = 0
+        mock_proc.communicate.return_value = (b"OK", b"")
+        mock_popen.return_value = mock_proc
+
+        def make_builder(to):
+            b = EmailMessageBuilder()
+            b.add_to(to)
+            b.set_subject("Batch")
+            b.set_body("Hi")
+            return b
+
+        client = MsmtpClient(transport="msmtp")
+        results = client.send_many([make_builder("a@example.com"),
+                                    make_builder("b@example.com")])
+
+        self.assertEqual(mock_popen.call_count, 2)
+        self.assertEqual(results, [(True, None), (True, None)])
+
+        results = client.send_parallel([make_builder("c@example.com")])
+        self.assertEqual(mock_popen.call_count, 3)
+        self.assertEqual(results, [(True, None)])
+
+    @patch("msmtp_mail._load_smtp_config")
+    @patch("msmtp_mail.smtplib.SMTP")
+    def test_send_smtplib_starttls_on_port_587(self, mock_smtp, mock_conf):
+        """Test the README's port 587 config uses SMTP + starttls()."""
+        mock_conf.return_value = {"host": "smtp.gmail.com", "port": 587,
+                                  "user": "u", "password": "p", "starttls": True}
+
+        b = EmailMessageBuilder()
+        b.add_to("dest@example.com")
+        b.set_subject("OK")
+        b.set_body("Hi")
+
+        client = MsmtpClient()
+        client.send(b)
+
+        self.assertEqual(mock_smtp.call_count, 1)
+        smtp = mock_smtp.return_value
+        smtp.starttls.assert_called_once()
+        smtp.login.assert_called_once_with("u", "p")
+
+    @patch("msmtp_mail._load_smtp_config")
+    @patch("msmtp_mail.smtplib.SMTP_SSL")
+    def test_warm_preconnects(self, mock_smtp_ssl, mock_conf):
+        """Test warm=True opens the connection before the first send()."""
+        mock_conf.return_value = {"host": "smtp.test", "port": 465,
+                                  "user": "u", "password": "p"}
+
+        client = MsmtpClient(warm=True)
+        client._warm_thread.join(timeout=5)
+        self.assertEqual(mock_smtp_ssl.call_count, 1)
+
+        b = EmailMessageBuilder()
+        b.add_to("dest@example.com")
+        b.set_subject("Warm")
+        b.set_body("Hi")
+        client.send(b)
+        self.assertEqual(mock_smtp_ssl.call_count, 1)  # no second handshake
+
+    # -----------------------
+    # SmtpConnectionPool tests
+    # -----------------------
+    @patch("msmtp_mail.smtplib.SMTP_SSL")
+    def test_pool_reuses_and_retires_connections(self, mock_smtp_ssl):
+        """Test pool reuse and retirement after max_msgs_per_conn messages."""
+        pool = SmtpConnectionPool(host="smtp.test", port=465, user="u", password="p",
+                                  max_size=2, max_msgs_per_conn=2)
+        try:
+            with pool.acquire():
+                pass
+            with pool.acquire():
+                pass
+            # First connection retired after 2 messages, third acquire opens a new one
+            with pool.acquire():
+                pass
+            self.assertEqual(mock_smtp_ssl.call_count, 2)
+        finally:
+            pool.close()
+
+    @patch("msmtp_mail.smtplib.SMTP_SSL")
+    def test_pool_slot_released_on_any_exception(self, mock_smtp_ssl):
+        """Test an arbitrary exception inside acquire() frees the pool slot."""
+        pool = SmtpConnectionPool(host="smtp.test", port=465, user="u", password="p",
+                                  max_size=1)
+        try:
+            with self.assertRaises(ValueError):
+                with pool.acquire():
+                    raise ValueError("boom")
+            self.assertEqual(pool._size, 0)
+            # The slot is free again: this must not block
+            with pool.acquire():
+                pass
+        finally:
+            pool.close()
+
+    @patch("msmtp_mail.smtplib.SMTP_SSL")
+    def test_client_sends_through_pool(self, mock_smtp_ssl):
+        """Test that MsmtpClient uses the pool when one is provided."""
+        pool = SmtpConnectionPool(host="smtp.test", port=465, user="u", password="p")
+        try:
+            b = EmailMessageBuilder()
+            b.add_to("dest@example.com")
+            b.set_subject("Pooled")
+            b.set_body("Hi")
+
+            client = MsmtpClient(use_msmtp=False, pool=pool)
+            client.send(b)
+
+            smtp = mock_smtp_ssl.return_value
+            self.assertEqual(smtp.sendmail.call_count, 1)
+        finally:
+            pool.close()
+
+    @patch("msmtp_mail._load_smtp_config")
+    @patch("msmtp_mail.smtplib.SMTP_SSL")
+    def test_send_parallel_results_in_order(self, mock_smtp_ssl, mock_conf):
+        """Test send_parallel returns one ordered result per builder."""
+        mock_conf.return_value = {"host": "smtp.test", "port": 465,
+                                  "user": "u", "password": "p"}
+
+        def make_builder(to):
+            b = EmailMessageBuilder()
+            b.add_to(to)
+            b.set_subject("Parallel")
+            b.set_body("Hi")
+            return b
+
+        client = MsmtpClient(use_msmtp=False)
+        results = client.send_parallel(
+            [make_builder(f"r{i}@example.com") for i in range(4)], workers=2)
+
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(ok for ok, _ in results))
+        smtp = mock_smtp_ssl.return_value
+        self.assertEqual(smtp.sendmail.call_count, 4)
+
+    # -----------------------
+    # Logging tests
+    # -----------------------
+    @patch("msmtp_mail.subprocess.Popen")
+    def test_log_written_through_rotating_handler(self, mock_popen):
+        """Test that send results go through the rotating send log."""
+        from logging.handlers import RotatingFileHandler
+        mock_proc = MagicMock()
+        mock_proc.returncode = 0
+        mock_proc.communicate.return_value = (b"", b"")
+        mock_popen.return_value = mock_proc
+
+        log_path = os.path.join(self.test_dir, "test_send.log")
+        b = EmailMessageBuilder()
+        b.add_to("dest@example.com")
+        b.set_subject("Logged")
+        b.set_body("Hi")
+
+        client = MsmtpClient(log_file=log_path, transport="msmtp")
+        try:
+            self.assertIsInstance(client._audit.handlers[0], RotatingFileHandler)
+            client.send(b)
+            client.flush_log()
+            with open(log_path, encoding="utf-8") as f:
+                content = f.read()
+            self.assertIn("OK", content)
+            self.assertIn("Logged", content)
+        finally:
+            for handler in client._audit.handlers:
+                handler.close()
+            if os.path.exists(log_path):
+                os.remove(log_path)
+
     # -----------------------
     # Recipients combination test
     # -----------------------